@@ -46,7 +46,7 @@ class SubmissionPackage:
         self.endpoint_title = alternate_location
         self.collections = {}
         self.endpoints = []
-        self.auth = requests.auth.HTTPBasicAuth(self.config.username, self.config.password)
+        self.auth = CachedHTTPBasicAuth(self.config.username, self.config.password)
         self.get_collections()
         self.get_custom_endpoints()
         self.validation_results = []
@@ -329,7 +329,7 @@ class SubmissionPackage:
         session = requests.session()
         total_package_size = 0
         for i, (url, file_name) in enumerate(self.download_links):
-            r = session.get(url, auth=(self.username, self.password), stream=True)
+            r = session.get(url, auth=self.auth, stream=True)
             size = r.headers['content-length']
             total_package_size += int(size)
             self.download_links[i] = (url, file_name, int(size))
@@ -348,13 +348,20 @@ class SubmissionPackage:
             file_name = file_name.split('/')
             file_name = file_name[1]
             file = os.path.join(path, file_name)
-            r = session.get(url, auth=(self.username, self.password), stream=True)
-            with open(file, 'wb') as out_file:
-                for chunk in r.iter_content(chunk_size=1024 * 1024):
-                    if chunk:
-                        out_file.write(chunk)
-                        if not hide_progress:
-                            package_download.update(sys.getsizeof(chunk))
+            partial_file = file + '.partial'
+            r = session.get(url, auth=self.auth, stream=True)
+            # write to a temp file so that an existing copy of the file is only replaced by a complete download
+            try:
+                with open(partial_file, 'wb') as out_file:
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        if chunk:
+                            out_file.write(chunk)
+                            if not hide_progress:
+                                package_download.update(len(chunk))
+            except Exception:
+                remove_file_if_exists(partial_file)
+                raise
+            os.replace(partial_file, file)
             session.close()
         if not hide_progress:
             if package_download.total > package_download.n:
@@ -5,6 +5,7 @@ import gzip
 import shutil
 import sys
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from shutil import copyfile
 
 import pandas as pd
@@ -89,7 +90,7 @@ class Download(Protocol):
         self.datadictionary_url = self.config.datadictionary_api
         self.username = download_config.username
         self.password = download_config.password
-        self.auth = requests.auth.HTTPBasicAuth(self.config.username, self.config.password)
+        self.auth = CachedHTTPBasicAuth(self.config.username, self.config.password)
 
         # Instance Variables from 'args'
         if args.directory:
@@ -102,6 +103,8 @@ class Download(Protocol):
         self.s3_links_file = args.txt
         self.inline_s3_links = args.paths
         self.package_id = args.package
+        # every package endpoint is relative to this url, so only build it once
+        self.package_resource_url = '{}/{}'.format(self.package_url, self.package_id)
         self.data_structure = args.datastructure
         self.thread_num = args.workerThreads if args.workerThreads else max([1, multiprocessing.cpu_count() - 1])
         self.regex_file_filter = args.file_regex
@@ -129,6 +132,8 @@ class Download(Protocol):
         self.package_file_download_errors = set()
         # self.package_file_download_errors needs a lock if multiple threads will be adding to it simultaneously
         self.package_file_download_errors_lock = threading.Lock()
+        # requests.Session for each download thread. See get_s3_session
+        self.s3_sessions = threading.local()
 
         self.download_job_uuid = None
 
@@ -154,6 +159,13 @@ class Download(Protocol):
         }
         self.download_progress_report_file_path = self.initialize_verification_files()
         self.default_download_batch_size = 50
+        # files at least this large are downloaded using several concurrent byte-range requests
+        self.range_download_threshold = 100 * 1024 * 1024
+        self.range_download_parts = 4
+        # number of attempts for each part. A retried part continues from the last byte it received
+        self.range_download_attempts = 3
+        # size of the reads from the network (or gzip stream) and of the write buffer of the destination file
+        self.download_buffer_size = 1024 * 1024
         self.metadata_file_path = os.path.join(self.package_download_directory, NDATools.NDA_TOOLS_PACKAGE_FILE_METADATA)
 
     # exlcude arg list is the long-parameter name
@@ -369,7 +381,11 @@ class Download(Protocol):
         logger.info('')
         logger.info(' Exiting Program...')
 
-    def download_from_s3link(self, package_file, s3_link, err_if_exists=False, failed_s3_links_file=None):
+    def get_s3_session(self, s3_link):
+        """
+        Returns the requests.Session that the current thread uses to download files from s3. Sessions are re-used
+        between files, so each download thread keeps its connections to s3 alive instead of opening new ones per file.
+        """
         # check if we are downloading from alt endpoint where bucket name contains dots.
         def get_http_adapter(s3_link):
             bucket, path = deconstruct_s3_url(s3_link)
@@ -378,6 +394,17 @@ class Download(Protocol):
                 return AltEndpointSSLAdapter(**config)
             return HTTPAdapter(**config)
 
+        session = getattr(self.s3_sessions, 'session', None)
+        if session is None:
+            session = self.s3_sessions.session = requests.session()
+        # the bucket is part of the hostname unless the url is path-style, so one adapter per host is sufficient
+        tmp = urlparse(s3_link)
+        prefix = '{}://{}/'.format(tmp.scheme, tmp.netloc)
+        if prefix not in session.adapters:
+            session.mount(prefix, get_http_adapter(s3_link))
+        return session
+
+    def download_from_s3link(self, package_file, s3_link, err_if_exists=False, failed_s3_links_file=None):
         # use this instead of exists_ok in order to work with python v.2
         def mk_dir_ignore_err(dir):
             try:
@@ -391,6 +418,12 @@ class Download(Protocol):
                     raise
                 pass
 
+        def is_range_download_candidate(package_file):
+            try:
+                return self.range_download_parts > 1 and int(package_file['file_size']) >= self.range_download_threshold
+            except (TypeError, ValueError):
+                return False
+
         # declare to avoid 'reference before declared' error
         source_uri = None
         bytes_written = 0
@@ -491,17 +524,25 @@ class Download(Protocol):
             else:
                 # downloading to local machine
 
-                with requests.session() as s:
-                    s.mount(s3_link, get_http_adapter(s3_link))
-                    if resume_header:
-                        s.headers.update(resume_header)
-                    with open(partial_download, "ab" if downloaded else "wb") as download_file:
-                        with s.get(s3_link, stream=True) as response:
-                            response.raise_for_status()
-                            for chunk in response.iter_content(chunk_size=1024 * 1024 * 5):  # iterate 5MB chunks
-                                if chunk:
-                                    bytes_written += download_file.write(chunk)
-                os.rename(partial_download, completed_download)
+                s = self.get_s3_session(s3_link)
+                range_bytes_written = None
+                if not resume_header and is_range_download_candidate(package_file):
+                    range_bytes_written = self.download_ranges(s, s3_link, completed_download)
+                if range_bytes_written is None:
+                    with open(partial_download, "ab" if downloaded else "wb",
+                              buffering=self.download_buffer_size) as download_file:
+                        start = download_file.tell()
+                        try:
+                            with s.get(s3_link, headers=resume_header, stream=True) as response:
+                                response.raise_for_status()
+                                self.copy_response_to_file(response, download_file)
+                        finally:
+                            # keep track of partial progress so an interrupted download can be resumed
+                            bytes_written = download_file.tell() - start
+                    # unlike os.rename, os.replace also overwrites an existing file on Windows
+                    os.replace(partial_download, completed_download)
+                else:
+                    bytes_written = range_bytes_written
                 logger.info('Completed download {}'.format(completed_download))
                 return_value['actual_file_size'] = bytes_written
                 bucket, key = Utils.deconstruct_s3_url(s3_link)
@@ -547,11 +588,85 @@ class Download(Protocol):
             # if source_uri is set, it means they're downloading to s3 bucket and there will not be any partial file
             if bytes_written == 0 and not source_uri:
                 try:
-                    os.remove(partial_download)
-                except:
+                    remove_file_if_exists(partial_download)
+                except OSError:
                     logger.error('error removing partial file {}'.format(partial_download))
             return return_value
 
+    def download_ranges(self, session, s3_link, download_path):
+        """
+        Downloads s3_link into download_path using self.range_download_parts concurrent byte-range requests. Each part
+        is streamed over its own connection and written directly into its offset of a pre-sized temp file, which is
+        renamed to download_path once every part is complete. The temp file is not a '.partial' file, because a file
+        with gaps in it cannot be resumed by appending to it.
+
+        :param session: requests.Session returned by get_s3_session
+        :param s3_link: presigned url of the file
+        :param download_path: destination of the download
+        :return: Number of bytes written, or None if the server does not support range requests for s3_link. Nothing is
+        written to download_path in that case
+        """
+        # presigned urls are only signed for GET, so probe with a 1 byte range instead of a HEAD request
+        with session.get(s3_link, headers={'Range': 'bytes=0-0'}, stream=True) as probe:
+            probe.raise_for_status()
+            content_range = probe.headers.get('Content-Range', '')
+            # byte offsets are meaningless if the object is stored with a content-encoding (i.e gzip)
+            if probe.status_code != 206 or 'Content-Encoding' in probe.headers or not content_range.split('/')[-1].isdigit():
+                return None
+            total_size = int(content_range.split('/')[-1])
+
+        ranges_download = download_path + '.ranges'
+        part_size = -(-total_size // self.range_download_parts)
+        byte_ranges = [(start, min(start + part_size, total_size) - 1) for start in range(0, total_size, part_size)]
+
+        def download_range(byte_range):
+            start, end = byte_range
+            offset = start
+            for attempt in range(1, self.range_download_attempts + 1):
+                try:
+                    with session.get(s3_link, headers={'Range': 'bytes={}-{}'.format(offset, end)}, stream=True) as response:
+                        response.raise_for_status()
+                        if response.status_code != 206:
+                            raise Exception('Range request for bytes {}-{} was not honored for {}'.format(offset, end, s3_link))
+                        with open(ranges_download, 'r+b', buffering=self.download_buffer_size) as download_file:
+                            download_file.seek(offset)
+                            try:
+                                self.copy_response_to_file(response, download_file)
+                            finally:
+                                offset = download_file.tell()
+                    if offset > end:
+                        break
+                    raise Exception('Connection closed after bytes {}-{} of {}'.format(start, offset - 1, s3_link))
+                except Exception as e:
+                    if attempt == self.range_download_attempts:
+                        raise
+                    logger.debug('Retrying bytes {}-{} of {} after error: {}'.format(offset, end, s3_link, e))
+            return offset - start
+
+        try:
+            with open(ranges_download, 'wb') as download_file:
+                download_file.truncate(total_size)
+            with ThreadPoolExecutor(max_workers=len(byte_ranges)) as executor:
+                bytes_written = sum(executor.map(download_range, byte_ranges))
+            if bytes_written != total_size:
+                raise Exception('Expected {} bytes but only received {} for {}'.format(total_size, bytes_written, s3_link))
+            os.replace(ranges_download, download_path)
+        except:
+            remove_file_if_exists(ranges_download)
+            raise
+        return bytes_written
+
+    def copy_response_to_file(self, response, download_file):
+        """
+        Copies the body of a streamed response into download_file. The chunks are read straight from the underlying
+        urllib3 response in download_buffer_size pieces, skipping the extra generator layers of iter_content.
+        """
+        # stream() decodes the body when a content-encoding is set, like iter_content does. Unlike copyfileobj it keeps
+        # reading until the body is exhausted: with urllib3 1.x a decoded read can come back empty before the end of the
+        # body while the decoder is buffering, which would silently truncate the file
+        for chunk in response.raw.stream(self.download_buffer_size, decode_content=True):
+            download_file.write(chunk)
+
     def write_to_failed_download_link_file(self, failed_s3_links_file, s3_link, source_uri):
         src_bucket, src_path = Utils.deconstruct_s3_url(s3_link if s3_link else source_uri)
         s3_address = 's3://' + src_bucket + '/' + src_path
@@ -758,7 +873,8 @@ class Download(Protocol):
             logger.info('Retrieving s3 url information for {} nda file records'.format(len(all_records)))
             batch_size = 1000
             batches = [all_records[i:i + batch_size] for i in range(0, len(all_records), batch_size)]
-            for batch in batches:
+
+            def add_s3_urls_to_batch(batch):
                 result = self.get_presigned_urls([record['package_file_id'] for record in batch])
                 # result is a dictionary of package-file-id to presignedUrl
                 for record in batch:
@@ -766,6 +882,10 @@ class Download(Protocol):
                     dest_bucket, dest_path = Utils.deconstruct_s3_url(ps_url)
                     record['nda_s3_url'] = 's3://{}/{}'.format(dest_bucket, dest_path)
 
+            # the batches are independent of each other, so request them concurrently over the shared session
+            with ThreadPoolExecutor(max_workers=min(self.thread_num, Utils.SESSION_POOL_SIZE)) as executor:
+                list(executor.map(add_s3_urls_to_batch, batches))
+
             with open(verification_report_path, 'a', newline='') as verification_report:
                 download_progress_report_writer = csv.DictWriter(verification_report,
                                                                  fieldnames=self.download_job_progress_report_column_defs)
@@ -843,7 +963,7 @@ class Download(Protocol):
         exit_client()
 
     def get_temp_creds_for_file(self, package_file_id, custom_user_s3_endpoint=None):
-        url = self.package_url + '/{}/files/{}/download_token'.format(self.package_id, package_file_id)
+        url = self.package_resource_url + '/files/{}/download_token'.format(package_file_id)
         if custom_user_s3_endpoint:
             s3_dest_bucket, s3_dest_prefix = Utils.deconstruct_s3_url(custom_user_s3_endpoint)
             url += '?s3SourceBucket={}'.format(s3_dest_bucket)
@@ -852,7 +972,7 @@ class Download(Protocol):
         tmp = get_request(url, auth=self.auth,
                           error_handler=HttpErrorHandlingStrategy.reraise_status,
                           deserialize_handler=DeserializeHandler.none)
-        return json.loads(tmp.text)
+        return DeserializeHandler.convert_json(tmp)
 
     def generate_metadata_and_get_creds(self):
         logger.info(f'Getting list of all files in package at {time.strftime("%H:%M:%S")} ....')
@@ -884,24 +1004,27 @@ class Download(Protocol):
         result = self.download_from_s3link(file_resource, creds['downloadURL'])
         download_location = os.path.normpath(
             os.path.join(self.package_download_directory, result['package_file_expected_location']))
-        outfile = download_location.rstrip('.gz')
+        # rstrip('.gz') would also strip any trailing '.', 'g' or 'z' characters that precede the extension
+        outfile = download_location[:-len('.gz')] if download_location.endswith('.gz') else download_location
         logger.debug(f'unzipping metadata file at {time.strftime("%H:%M:%S")}...')
+        # the metadata file is never re-created once it exists, so unzip to a temp file and rename it when complete.
+        # Otherwise an interrupted run would leave a truncated metadata file behind
+        partial_outfile = outfile + '.partial'
         with gzip.open(download_location, 'rb') as f_in:
-            with open(outfile, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
+            with open(partial_outfile, 'wb', buffering=self.download_buffer_size) as f_out:
+                shutil.copyfileobj(f_in, f_out, self.download_buffer_size)
+        os.replace(partial_outfile, outfile)
         return outfile
 
     def get_package_file_metadata_creds(self):
-        url = self.package_url + \
-              '/{}/files/package_file_metadata'.format(self.package_id)
+        url = self.package_resource_url + '/files/package_file_metadata'
         tmp = get_request(url, auth=self.auth,
                           error_handler=HttpErrorHandlingStrategy.reraise_status,
                           deserialize_handler=DeserializeHandler.convert_json)
         return tmp
 
     def get_package_file(self, file_id):
-        url = self.package_url + \
-              '/{}/files/{}'.format(self.package_id, file_id)
+        url = self.package_resource_url + '/files/{}'.format(file_id)
         tmp = get_request(url, auth=self.auth, deserialize_handler=DeserializeHandler.convert_json)
         return tmp
 
@@ -911,51 +1034,48 @@ class Download(Protocol):
         return df[df['short_name'] == data_structure]
 
     def get_data_structure_manifest_file_info(self):
-        url = self.package_url + \
-              '/{}/files?page=1&size=all&types=Package%20Metadata&regex={}'.format(self.package_id,
-                                                                                   'datastructure_manifest.txt')
+        url = self.package_resource_url + \
+              '/files?page=1&size=all&types=Package%20Metadata&regex={}'.format('datastructure_manifest.txt')
         tmp = get_request(url, auth=self.auth, deserialize_handler=DeserializeHandler.none)
-        results = json.loads(tmp.text)['results']
+        results = DeserializeHandler.convert_json(tmp)['results']
         # return None instead of empty list, since this method is always supposed to return 1 thing
         return results[0] if results else None
 
     def get_data_structure_files(self):
-        url = self.package_url + \
-              '/{}/files?page=1&size=all&types=Data'.format(self.package_id)
+        url = self.package_resource_url + '/files?page=1&size=all&types=Data'
         tmp = get_request(url, auth=self.auth, deserialize_handler=DeserializeHandler.none)
         tmp.raise_for_status()
-        results = json.loads(tmp.text)['results']
+        results = DeserializeHandler.convert_json(tmp)['results']
         return [r for r in results if r['nda_file_type'] == 'Data']
 
     def get_data_structure_file_info(self, short_name):
-        url = self.package_url + \
-              '/{}/files?page=1&size=all&types=Package%20Metadata&types=Data&regex={}'.format(self.package_id,
-                                                                                              short_name)
+        url = self.package_resource_url + \
+              '/files?page=1&size=all&types=Package%20Metadata&types=Data&regex={}'.format(short_name)
         tmp = get_request(url, auth=self.auth, deserialize_handler=DeserializeHandler.none)
         tmp.raise_for_status()
-        results = json.loads(tmp.text)['results']
+        results = DeserializeHandler.convert_json(tmp)['results']
         # return None instead of empty list, since this method is always supposed to return 1 thing
         return results[0] if results else None
 
     def get_package_file_info(self, file_id):
-        url = self.package_url + '/{}/files/{}'.format(self.package_id, file_id)
+        url = self.package_resource_url + '/files/{}'.format(file_id)
         tmp = get_request(url, auth=self.auth, deserialize_handler=DeserializeHandler.none)
-        return json.loads(tmp.text)
+        return DeserializeHandler.convert_json(tmp)
 
     def get_package_info(self):
-        url = self.package_url + '/{}'.format(self.package_id)
+        url = self.package_resource_url
         tmp = get_request(url, auth=self.auth, deserialize_handler=DeserializeHandler.none)
-        return json.loads(tmp.text)
+        return DeserializeHandler.convert_json(tmp)
 
     def get_package_files_by_page(self, page, batch_size):
-        url = self.package_url + '/{}/files?page={}&size={}'.format(self.package_id, page, batch_size)
+        url = self.package_resource_url + '/files?page={}&size={}'.format(page, batch_size)
         if self.regex_file_filter:
             url += '&regex={}'.format(self.regex_file_filter)
         try:
             tmp = get_request(url, auth=self.auth,
                               error_handler=HttpErrorHandlingStrategy.reraise_status, deserialize_handler=DeserializeHandler.none)
             tmp.raise_for_status()
-            response = json.loads(tmp.text)
+            response = DeserializeHandler.convert_json(tmp)
             return response['results']
 
         except HTTPError as e:
@@ -975,7 +1095,7 @@ class Download(Protocol):
         # Use the batchGeneratePresignedUrls when retrieving multiple files
         if not self.verify_flg:
             logger.debug('Retrieving credentials for {} files'.format(len(id_list)))
-        url = self.package_url + '/{}/files/batchGeneratePresignedUrls'.format(self.package_id)
+        url = self.package_resource_url + '/files/batchGeneratePresignedUrls'
         response = post_request(url,  payload=id_list, auth=self.auth,
                            error_handler=HttpErrorHandlingStrategy.reraise_status, deserialize_handler=DeserializeHandler.convert_json)
         creds = {e['package_file_id']: e['downloadURL'] for e in response['presignedUrls']}
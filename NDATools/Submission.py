@@ -63,7 +63,7 @@ class Submission:
         self.source_bucket = None
         self.upload_tries = 0
         self.max_submit_time = 120
-        self.auth = requests.auth.HTTPBasicAuth(self.config.username, self.config.password)
+        self.auth = CachedHTTPBasicAuth(self.config.username, self.config.password)
         self.submission_id = submission_id
         self.package_id = package_id
         self.no_read_access = set()
@@ -205,18 +205,20 @@ class Submission:
 
     def batch_update_status(self, status=Status.COMPLETE):
         errors=[]
-        files_by_id = {f['id']:f for f in self.get_files()}
         def to_payload(file):
             payload = {
                 "id": file['id'],
                 "md5sum": "None",
                 "status": status
             }
-            file_key = sanitize_file_path(file['file_user_path'])
-            if file['id'] in files_by_id and int(files_by_id[file['id']]['size']) > 0:
-                payload['size'] = files_by_id[file['id']]['size']
-            elif file_key in self.full_file_path:
-                payload['size'] = self.full_file_path[file_key][1]
+            # incomplete_files comes from the same file list, so the service's size is already on the file resource.
+            # Only fall back to the local file-size (and sanitize the path) when the service doesn't have one yet
+            if int(file['size']) > 0:
+                payload['size'] = file['size']
+            else:
+                file_key = sanitize_file_path(file['file_user_path'])
+                if file_key in self.full_file_path:
+                    payload['size'] = self.full_file_path[file_key][1]
             return payload
 
         list_data = list(map(to_payload, self.incomplete_files))
@@ -285,12 +287,24 @@ class Submission:
             self.upload_queue.put([file, False, True])
         self.upload_queue.put(["STOP", False, True])
         self.upload_tries += 1
+
+        def update_total_progress(progress):
+            remaining = self.total_progress.total - self.total_progress.n
+            if progress > 0 and remaining > 0:
+                self.total_progress.update(min(progress, remaining))
+
         while any(map(lambda w: w.is_alive(), workers)):
             if not hide_progress:
+                # boto3 reports progress every few KB. Accumulate it and only update the progress bar every 1MB or 0.2s
+                pending_progress = 0
+                last_update = time.time()
                 for progress in iter(self.progress_queue.get, None):
-                    if (self.total_progress.n < self.total_progress.total
-                            and progress <= (self.total_progress.total - self.total_progress.n)):
-                        self.total_progress.update(progress)
+                    pending_progress += progress
+                    if pending_progress >= 1024 * 1024 or time.time() - last_update >= 0.2:
+                        update_total_progress(pending_progress)
+                        pending_progress = 0
+                        last_update = time.time()
+                update_total_progress(pending_progress)
             time.sleep(2)
         if not hide_progress:
             if self.total_progress.n < self.total_progress.total:
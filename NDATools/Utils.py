@@ -1,7 +1,9 @@
 from __future__ import absolute_import, with_statement
 
+import base64
 import datetime
 import functools
+import http.cookiejar
 import json
 import logging
 import os
@@ -17,6 +19,16 @@ import boto3
 import requests
 import requests.packages.urllib3.util
 from requests.adapters import HTTPAdapter, Retry
+from requests.structures import CaseInsensitiveDict
+
+import NDATools
+
+try:
+    # orjson parses large responses (file listings, presigned urls...) considerably faster than the json module
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 IS_PY2 = sys.version_info < (3, 0)
 
@@ -28,6 +40,10 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# sanitize_file_path is called for every associated file, so compile these once
+_POSIX_FULL_PATH_RE = re.compile(r'^/.+$')
+_WINDOWS_FULL_PATH_RE = re.compile(r'^\D:/.+$')
+
 
 if sys.version_info[0] < 3:
     input = raw_input
@@ -52,7 +68,23 @@ class DeserializeHandler():
 
     @staticmethod
     def convert_json(r):
-        return json.loads(r.text)
+        # parse the raw bytes; r.text would decode the whole body into a str first
+        return _json_loads(r.content)
+
+class CachedHTTPBasicAuth(requests.auth.HTTPBasicAuth):
+    """
+    HTTPBasicAuth that builds the Authorization header once instead of base64 encoding the credentials on every request
+    """
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        # encoded the same way as requests.auth.HTTPBasicAuth
+        credentials = b':'.join(c if isinstance(c, bytes) else str(c).encode('latin1') for c in (username, password))
+        self.header = 'Basic ' + base64.b64encode(credentials).decode('ascii')
+
+    def __call__(self, r):
+        r.headers['Authorization'] = self.header
+        return r
 
 class HttpErrorHandlingStrategy():
     # error handling implementation methods. Each method takes a response object
@@ -153,18 +185,19 @@ def sanitize_file_path(file):
     # Sanitize all backslashes (\) with forward slashes (/)
     file_key = file.replace('\\', '/').replace('//', '/')
     # If Mac/Linux full path
-    if re.search(r'^/.+$', file):
+    if _POSIX_FULL_PATH_RE.search(file):
         file_key = file.split('/', 1)[1]
     # If Windows full path
-    elif re.search(r'^\D:/.+$', file_key):
+    elif _WINDOWS_FULL_PATH_RE.search(file_key):
         file_key = file_key.split(':/', 1)[1]
     return file_key
 
 
 def check_read_permissions(file):
     try:
-        open(file)
-        return True
+        # binary mode skips setting up a text decoder; the file is only opened to test that it is readable
+        with open(file, 'rb'):
+            return True
     except (OSError, IOError) as err:
         if err.errno == 13:
             logger.info('Permission Denied: {}'.format(file))
@@ -199,6 +232,16 @@ def get_traceback():
     return tb
 
 
+def remove_file_if_exists(file):
+    """
+    Removes file. Does nothing if the file doesn't exist, which saves a stat call compared to checking first.
+    """
+    try:
+        os.remove(file)
+    except FileNotFoundError:
+        pass
+
+
 # return bucket and key for url (handles http and s3 protocol)
 def deconstruct_s3_url(url):
     tmp = urlparse(url)
@@ -251,36 +294,81 @@ def is_json(test):
     except:
         return False
 
+# large enough that every worker thread (validation, upload, download) can keep its own connection alive
+SESSION_POOL_SIZE = 32
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the requests.Session shared by all calls to the NDA web services. Re-using one session lets urllib3 keep
+    connections alive between requests instead of paying for a new TCP/TLS handshake on every call.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retries = Retry(total=10,
+                            backoff_factor=0.1,
+                            status_forcelist=[ 502, 503, 504 ])
+            adapter = HTTPAdapter(pool_connections=SESSION_POOL_SIZE,
+                                  pool_maxsize=SESSION_POOL_SIZE,
+                                  max_retries=retries)
+            session = requests.Session()
+            session.headers = CaseInsensitiveDict({
+                'User-Agent': 'nda-tools/{}'.format(NDATools.__version__),
+                'Connection': 'keep-alive',
+                # without this, http.client sends 'Accept-Encoding: identity' and large json responses (file listings,
+                # presigned urls...) are sent uncompressed. urllib3 decodes the response transparently.
+                # Pass headers={'Accept-Encoding': 'identity'} to get_request etc. to turn this off for a single call
+                'Accept-Encoding': 'gzip, deflate'
+            })
+            # the session is shared by calls made with different credentials, so never keep cookies between requests
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+
 @retry_connection_errors
 def _send_prepared_request(prepped, timeout=150, deserialize_handler=DeserializeHandler.convert_json, error_handler=HttpErrorHandlingStrategy.print_and_exit):
-    with requests.Session() as session:
-        retries = Retry(total=10,
-                        backoff_factor=0.1,
-                        status_forcelist=[ 502, 503, 504 ])
-        logger.debug('{} {} @ {}'.format(prepped.method , prepped.url, datetime.datetime.now()))
-        session.mount(prepped.url, HTTPAdapter(max_retries=retries))
-        tmp = session.send(prepped, timeout=timeout)
-        logger.debug('{} {} (elapsed = {})- STATUS {}'.format(prepped.method, prepped.url, tmp.elapsed, tmp.status_code))
-        if not tmp.ok:
-            error_handler(tmp)
+    session = get_session()
+    if hasattr(prepped.body, 'seek'):
+        # the body is a file that is streamed to the server. Make sure it is sent from the start when retrying
+        requests.utils.rewind_body(prepped)
+    logger.debug('{} {} @ {}'.format(prepped.method , prepped.url, datetime.datetime.now()))
+    tmp = session.send(prepped, timeout=timeout)
+    logger.debug('{} {} (elapsed = {})- STATUS {}'.format(prepped.method, prepped.url, tmp.elapsed, tmp.status_code))
+    if not tmp.ok:
+        error_handler(tmp)
     return deserialize_handler(tmp)
 
 
+def _request(method, url, payload, headers, auth, timeout, deserialize_handler, error_handler):
+    if payload is None:
+        req = requests.Request(method, url, headers=headers, auth=auth)
+    else:
+        data_param, headers = get_data_and_header_params(payload, headers)
+        req = requests.Request(method, url, headers=headers, auth=auth, **data_param)
+    # only the session headers are merged into the request. Session.prepare_request would also add the session cookies
+    # and credentials from ~/.netrc, which requests made without auth (or with other credentials) must not pick up
+    req.headers = requests.sessions.merge_setting(req.headers, get_session().headers, dict_class=CaseInsensitiveDict)
+    return _send_prepared_request(req.prepare(), timeout, deserialize_handler, error_handler)
+
 def get_request(url, headers={}, auth=None, timeout=150, deserialize_handler=DeserializeHandler.convert_json, error_handler=HttpErrorHandlingStrategy.print_and_exit):
-    req = requests.Request('GET', url, auth=auth, headers=headers)
-    return _send_prepared_request(req.prepare(), timeout=timeout, deserialize_handler=deserialize_handler, error_handler=error_handler)
+    return _request('GET', url, None, headers, auth, timeout, deserialize_handler, error_handler)
 
 def post_request(url, payload=None, headers={}, auth=None, timeout=150, deserialize_handler=DeserializeHandler.convert_json, error_handler=HttpErrorHandlingStrategy.print_and_exit):
-    data_param, headers = get_data_and_header_params(payload, headers)
-    req = requests.Request('POST',  url, auth=auth,  headers=headers, **data_param)
-    return _send_prepared_request(req.prepare(), timeout=timeout, deserialize_handler=deserialize_handler, error_handler=error_handler)
+    return _request('POST', url, payload, headers, auth, timeout, deserialize_handler, error_handler)
 
 def put_request(url, payload=None, headers={}, auth=None, timeout=150, deserialize_handler=DeserializeHandler.convert_json, error_handler=HttpErrorHandlingStrategy.print_and_exit):
-    data_param, headers = get_data_and_header_params(payload, headers)
-    req = requests.Request('PUT',  url, auth=auth, headers=headers, **data_param)
-    return _send_prepared_request(req.prepare(), timeout=timeout, deserialize_handler=deserialize_handler, error_handler=error_handler)
+    return _request('PUT', url, payload, headers, auth, timeout, deserialize_handler, error_handler)
 
 def get_data_and_header_params(payload, headers):
+    # copy so that the caller's dict (or the shared default argument) is never modified
+    headers = dict(headers)
     data_param = {}
     if 'content-type' not in headers:
         if isinstance(payload, dict) or isinstance(payload, list):
@@ -59,7 +59,7 @@ class Validation:
         self.original_uuids = original_uuids
         self.data_structures_with_missing_rows = None
         if self.config.password:
-            self.auth = requests.auth.HTTPBasicAuth(self.config.username, self.config.password)
+            self.auth = CachedHTTPBasicAuth(self.config.username, self.config.password)
         else:
             self.auth = None
 
@@ -123,31 +123,36 @@ class Validation:
             }
 
         if self.pending_changes:
-            # remove the associated_files that have already been uplaoded
+            # index pending changes by short-name. If a short-name appears more than once, the first change is used
+            pending_changes_by_short_name = {}
+            for pending_change in self.pending_changes:
+                pending_changes_by_short_name.setdefault(pending_change['shortName'], pending_change)
+
+            # group the associated files and row counts of the files that the user uploaded by short-name
             structure_to_new_associated_files = {}
+            structure_to_new_row_count = {}
+            for validation_result in self.uuid_dict.values():
+                short_name = validation_result['short_name']
+                structure_to_new_associated_files.setdefault(short_name, set()).update(
+                    validation_result['associated_file_paths'])
+                structure_to_new_row_count[short_name] = structure_to_new_row_count.get(short_name, 0) + \
+                                                         validation_result['rows']
+
+            # remove the associated_files that have already been uplaoded and find datastructures with missing data
             unrecognized_ds = set()
-            for uuid in self.uuid_dict:
-                short_name = self.uuid_dict[uuid]['short_name']
-                structure_to_new_associated_files[short_name] = set()
-            for uuid in self.uuid_dict:
-                short_name = self.uuid_dict[uuid]['short_name']
-                structure_to_new_associated_files[short_name].update(
-                    {file for file in self.uuid_dict[uuid]['associated_file_paths']})
-
             files_to_upload = set()
-            for data_structure in structure_to_new_associated_files:
-                expected_change_for_data_structure = next(
-                    filter(lambda pending_change: pending_change['shortName'] == data_structure, self.pending_changes),
-                    None)
-                if expected_change_for_data_structure is not None:
-                    original_associated_file_set = {associated_file for associated_file in
-                                                    expected_change_for_data_structure['associatedFiles']}
-                    for new_asssociated_file in structure_to_new_associated_files[data_structure]:
-                        if new_asssociated_file not in original_associated_file_set:
-                            files_to_upload.update({new_asssociated_file})
-                else:
-                    unrecognized_ds.update({data_structure})
-
+            data_structures_with_missing_rows = []
+            for data_structure, new_associated_files in structure_to_new_associated_files.items():
+                expected_change_for_data_structure = pending_changes_by_short_name.get(data_structure)
+                if expected_change_for_data_structure is None:
+                    unrecognized_ds.add(data_structure)
+                    continue
+                files_to_upload.update(new_associated_files.difference(
+                    expected_change_for_data_structure['associatedFiles']))
+                if structure_to_new_row_count[data_structure] < expected_change_for_data_structure['rows']:
+                    data_structures_with_missing_rows.append((data_structure,
+                                                              expected_change_for_data_structure['rows'],
+                                                              structure_to_new_row_count[data_structure]))
 
             self.associated_files_to_upload = set(files_to_upload)
             if len(files_to_upload) > 0:
@@ -155,29 +160,6 @@ class Validation:
             else:
                 logger.info('\nDetected that all associated files have been previously uploaded from previous submission\n')
 
-            # Find datastructures with missing data
-            # create a map of short_name to num-rows for files that the user uploaded
-            structure_to_new_row_count = {}
-            for uuid in self.uuid_dict:
-                short_name = self.uuid_dict[uuid]['short_name']
-                structure_to_new_row_count[short_name] = 0
-            for uuid in self.uuid_dict:
-                short_name = self.uuid_dict[uuid]['short_name']
-                structure_to_new_row_count[short_name] += self.uuid_dict[uuid]['rows']
-
-            data_structures_with_missing_rows = []
-            for data_structure in structure_to_new_row_count:
-                expected_change_for_data_structure = next(
-                    filter(lambda pending_change: pending_change['shortName'] == data_structure, self.pending_changes),
-                    None)
-                if expected_change_for_data_structure is not None:
-                    if structure_to_new_row_count[data_structure] < expected_change_for_data_structure['rows']:
-                        data_structures_with_missing_rows.append((data_structure,
-                                                                  expected_change_for_data_structure['rows'],
-                                                                  structure_to_new_row_count[data_structure]))
-                else:
-                    unrecognized_ds.update({data_structure})
-
             # update list of validation-uuids to be used during the packaging step
             new_uuids, unrecognized_ds = self.generate_uuids_for_qa_workflow(unrecognized_ds)
 
@@ -329,24 +311,19 @@ class Validation:
         unrecognized_structures = set(unrecognized_ds)
         new_uuids = set(self.original_uuids)
         val_by_short_name = {}
-        for uuid in self.uuid_dict:
-            short_name = self.uuid_dict[uuid]['short_name']
-            val_by_short_name[short_name] = set()
-        for uuid in self.uuid_dict:
-            short_name = self.uuid_dict[uuid]['short_name']
-            val_by_short_name[short_name].update({uuid})
-        for short_name in val_by_short_name:
+        for uuid, validation_result in self.uuid_dict.items():
+            val_by_short_name.setdefault(validation_result['short_name'], set()).add(uuid)
+        # if a short-name appears more than once in the pending changes, the last change is used
+        pending_changes_by_short_name = {change['shortName']: change for change in self.pending_changes}
+        for short_name, uuids in val_by_short_name.items():
             # find the pending change with the same short name
-            matching_change = {}
-            for change in self.pending_changes:
-                if change['shortName'] == short_name:
-                    matching_change = change
+            matching_change = pending_changes_by_short_name.get(short_name)
             if not matching_change:
                 unrecognized_structures.add(short_name)
             else:
                 # prevValidationUuids is the set of validation-uuids on the pending changes resource
-                new_uuids = new_uuids.difference(set(matching_change['validationUuids']))
-                new_uuids.update({res for res in val_by_short_name[short_name]})
+                new_uuids = new_uuids.difference(matching_change['validationUuids'])
+                new_uuids.update(uuids)
 
         return list(new_uuids), unrecognized_structures
 
@@ -472,7 +449,7 @@ class Validation:
                     self.shutdown_flag.set()
                     break
                 try:
-                    file = open(file_name, 'r')
+                    file = open(file_name, 'rb')
                 except IOError:
                     if self.progress_bar:
                         self.progress_bar.close()
@@ -481,9 +458,9 @@ class Validation:
 
                     exit_client()
 
-                data = file.read()
-
-                response = post_request(self.api_scope, data, timeout=self.validation_timeout, headers = {'content-type':'text/csv'}, auth=self.auth)
+                # pass the open file instead of its contents so the csv is streamed from disk rather than held in memory
+                with file:
+                    response = post_request(self.api_scope, file, timeout=self.validation_timeout, headers = {'content-type':'text/csv'}, auth=self.auth)
                 while response and not response['done']:
                     response = get_request("/".join([self.api, response['id']]), auth=self.auth)
                     time.sleep(polling)
@@ -1,11 +1,12 @@
 import argparse
 import signal
+from concurrent.futures import ThreadPoolExecutor
 
 import NDATools
 from NDATools.BuildPackage import SubmissionPackage
 from NDATools.Configuration import *
 from NDATools.Submission import Submission
-from NDATools.Utils import evaluate_yes_no_input, exit_client, get_request
+from NDATools.Utils import evaluate_yes_no_input, exit_client, get_request, CachedHTTPBasicAuth, SESSION_POOL_SIZE
 from NDATools.Validation import Validation
 
 logger = logging.getLogger(__name__)
@@ -308,7 +309,7 @@ def retrieve_replacement_submission_params(config, submission_id):
     # get submission-id
     api = type('', (), {})()
     api.config = config
-    auth = requests.auth.HTTPBasicAuth(config.username, config.password)
+    auth = CachedHTTPBasicAuth(config.username, config.password)
     # check if the qa token provided is actually the latest or not
     try:
         response = get_request('/'.join([config.submission_api, submission_id, 'change-history']), auth=auth)
@@ -356,12 +357,17 @@ If you need to make further edits to this submission, please reach out the the N
     pending_changes = []
     original_submission_id = submission_id
     original_uuids = {uuid for uuid in response['validation_uuids']}
+    pending_uuids = list({uuid: None for change in response['pendingChanges'] for uuid in change['validationUuids']})
+    # the validation lookups are independent of each other, so fetch them concurrently instead of one round-trip at a time
+    with ThreadPoolExecutor(max_workers=max(1, min(len(pending_uuids), SESSION_POOL_SIZE))) as executor:
+        validations = dict(zip(pending_uuids, executor.map(
+            lambda uuid: get_request('/'.join([config.validation_api, uuid])), pending_uuids)))
     for change in response['pendingChanges']:
         validation_uuids = change['validationUuids']
         associated_files = []
         manifest_files = []
         for uuid in validation_uuids:
-            response = get_request('/'.join([config.validation_api, uuid]))
+            response = validations[uuid]
             associated_files.extend(response['associated_file_paths'])
             manifest_files.extend(manifest['localFileName'] for manifest in response['manifests'])
         change['associatedFiles'] = associated_files
@@ -12,7 +12,7 @@ setup(
         name='nda_tools',
         description="NIMH Data Archive Python Client",
         install_requires=['boto3', 'botocore', 'tqdm', 'requests', 'mock', 'packaging','pyyaml', 'keyring', 'pandas'],
-        extras_require={'test': ['pytest', 'pytest-datadir']},
+        extras_require={'test': ['pytest', 'pytest-datadir'], 'orjson': ['orjson']},
         version= NDATools.__version__,
         long_description=long_description,
         long_description_content_type="text/markdown",
@@ -1,14 +1,18 @@
 import datetime
+import gzip
+import io
 import itertools
 import json
 import math
 import os
 import shutil
 import sys
+import threading
 from unittest.mock import ANY, MagicMock
 
 import pytest
 from requests import HTTPError
+from urllib3.response import HTTPResponse
 
 import NDATools.Utils
 import NDATools.clientscripts.downloadcmd
@@ -411,3 +415,117 @@ class TestDownload:
         test(config,args, batch_size=TEST_BATCH_SIZE, completed_files=all_files[:4], get_package_files_by_page_args_list=[])
         test(config,args, batch_size=TEST_BATCH_SIZE, completed_files=all_files[:5], get_package_files_by_page_args_list=[])
         test(config,args, batch_size=TEST_BATCH_SIZE, completed_files=all_files[:], get_package_files_by_page_args_list=[])
+
+    @staticmethod
+    def _range_session(content, honor_ranges=True, failures=None):
+        # failures maps the start of a part to the bodies returned for its first requests (the probe is not affected).
+        # A body shorter than the part simulates a dropped connection, an exception is raised instead of being returned
+        failures = failures if failures is not None else {}
+
+        def get(url, headers=None, stream=False):
+            response = MagicMock()
+            byte_range = (headers or {}).get('Range')
+            if honor_ranges and byte_range:
+                start, end = map(int, byte_range.split('=')[1].split('-'))
+                body = content[start:end + 1]
+                if failures.get(start) and byte_range != 'bytes=0-0':
+                    body = failures[start].pop(0)
+                    if isinstance(body, Exception):
+                        raise body
+                response.status_code = 206
+                response.headers = {'Content-Range': 'bytes {}-{}/{}'.format(start, end, len(content))}
+                response.raw = HTTPResponse(body=io.BytesIO(body), preload_content=False)
+            else:
+                response.status_code = 200
+                response.headers = {}
+                response.raw = HTTPResponse(body=io.BytesIO(content), preload_content=False)
+            response.__enter__.return_value = response
+            return response
+
+        session = MagicMock()
+        session.get.side_effect = get
+        return session
+
+    @staticmethod
+    def _range_download(tmpdir, session):
+        download = Download.__new__(Download)
+        download.range_download_threshold = 1024
+        download.range_download_parts = 4
+        download.range_download_attempts = 3
+        download.download_buffer_size = 1024
+        download.package_download_directory = str(tmpdir)
+        download.custom_user_s3_endpoint = None
+        download.download_job_progress_report_column_defs = {'exists': False, 'actual_file_size': 0}
+        download.package_file_download_errors = set()
+        download.package_file_download_errors_lock = threading.Lock()
+        download.get_s3_session = lambda s3_link: session
+        return download
+
+    def test_download_ranges(self, tmpdir):
+        content = bytes(range(256)) * 41
+        download = self._range_download(tmpdir, self._range_session(content))
+        download_path = str(tmpdir / 'file')
+
+        assert download.download_ranges(download.get_s3_session(None), 'https://fake-presigned-url', download_path) == len(content)
+        with open(download_path, 'rb') as f:
+            assert f.read() == content
+        assert not os.path.exists(download_path + '.ranges')
+        # 1 probe request + 1 request per part
+        assert download.get_s3_session(None).get.call_count == 5
+
+    def test_download_ranges_not_supported(self, tmpdir):
+        download = self._range_download(tmpdir, self._range_session(b'content', honor_ranges=False))
+        download_path = str(tmpdir / 'file')
+
+        assert download.download_ranges(download.get_s3_session(None), 'https://fake-presigned-url', download_path) is None
+        assert not os.path.exists(download_path)
+        assert not os.path.exists(download_path + '.ranges')
+
+    def test_download_from_s3link_ranges(self, tmpdir):
+        s3_link = 'https://NDAR_Central_1.s3.amazonaws.com/file.bin?X-Amz-Signature=fake'
+
+        def download_file(content, session):
+            package_file = {'package_file_id': 1, 'download_alias': 'file.bin', 'file_size': len(content)}
+            result = self._range_download(tmpdir, session).download_from_s3link(package_file, s3_link)
+            assert not os.path.exists(str(tmpdir / 'file.bin.partial'))
+            assert not os.path.exists(str(tmpdir / 'file.bin.ranges'))
+            return result
+
+        def assert_downloaded(result, content):
+            assert result['exists']
+            assert result['actual_file_size'] == len(content)
+            with open(str(tmpdir / 'file.bin'), 'rb') as f:
+                assert f.read() == content
+            os.remove(str(tmpdir / 'file.bin'))
+
+        content = bytes(range(256)) * 41
+
+        # files below the threshold are downloaded with a single request
+        session = self._range_session(content[:512])
+        assert_downloaded(download_file(content[:512], session), content[:512])
+        assert session.get.call_count == 1
+
+        # the part starting at byte 0 fails twice, and is continued from where the dropped connection left off
+        session = self._range_session(content, failures={0: [NDATools.Utils.requests.ConnectionError(), content[:100]]})
+        assert_downloaded(download_file(content, session), content)
+        assert {'Range': 'bytes=100-2623'} in [call[1]['headers'] for call in session.get.call_args_list]
+
+        # servers which ignore the range header fall back to a single stream
+        assert_downloaded(download_file(content, self._range_session(content, honor_ranges=False)), content)
+
+        # a part which keeps failing fails the download, without leaving a file behind that looks resumable
+        session = self._range_session(content, failures={2624: [NDATools.Utils.requests.ConnectionError()] * 3})
+        result = download_file(content, session)
+        assert not result['exists']
+        assert not os.path.exists(str(tmpdir / 'file.bin'))
+
+    def test_copy_response_to_file_decodes_content(self):
+        content = b'nda-tools' * 10000
+        download = Download.__new__(Download)
+        download.download_buffer_size = 1024
+        response = MagicMock()
+        response.raw = HTTPResponse(body=io.BytesIO(gzip.compress(content)), headers={'Content-Encoding': 'gzip'},
+                                    preload_content=False)
+        download_file = io.BytesIO()
+        download.copy_response_to_file(response, download_file)
+        assert download_file.getvalue() == content
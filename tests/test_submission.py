@@ -121,3 +121,27 @@ class TestSubmission():
             assert submission.status == submission_resource['submission_status']
             assert submission.get_files()==files_resource
 
+    def test_batch_update_status(self, monkeypatch, config, submission_with_files, api_endpoint, batch_update_status):
+        submission_resource, files_resource, _ = submission_with_files
+        for f in files_resource:
+            if f['status'] != Status.COMPLETE:
+                f['size'] = 0
+        ready_file = [f for f in files_resource if f['status'] != Status.COMPLETE][0]
+        file_key = Utils.sanitize_file_path(ready_file['file_user_path'])
+
+        with monkeypatch.context() as m:
+            mock_put = MagicMock(return_value=batch_update_status)
+            m.setattr(Submission, 'put_request', mock_put)
+            m.setattr(Submission, 'get_request', api_endpoint(files_resource))
+
+            submission = Submission.Submission(submission_id=submission_resource['submission_id'],
+                                               full_file_path={file_key: ('/fake/abs/path', 10)},
+                                               thread_num=1,
+                                               batch_size=20,
+                                               allow_exit=True,
+                                               config=config)
+            errors = submission.batch_update_status(status=Status.UPLOADING)
+
+            assert errors == batch_update_status['errors']
+            assert json.loads(mock_put.call_args.kwargs['payload']) == [
+                {'id': ready_file['id'], 'md5sum': 'None', 'status': Status.UPLOADING, 'size': 10}]
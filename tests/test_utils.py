@@ -1,7 +1,12 @@
+import http.client
 import logging
 import os
+import tempfile
 
-from NDATools.Utils import parse_local_files, sanitize_file_path, check_read_permissions
+import requests
+
+from NDATools.Utils import parse_local_files, sanitize_file_path, check_read_permissions, get_data_and_header_params, \
+    get_session, get_request, remove_file_if_exists, CachedHTTPBasicAuth, DeserializeHandler
 from unittest import TestCase
 from mock import patch
 import mock
@@ -79,3 +84,60 @@ class TestUtils(TestCase):
         mock_file.side_effect = IOError()
         test_file = os.path.join(os.path.expanduser('~'), 'NDATools\\clientscripts\\config\\settings.cfg')
         self.assertFalse(check_read_permissions(test_file))
+
+    def test_get_session_is_shared(self):
+        self.assertIs(get_session(), get_session())
+        self.assertTrue(get_session().headers['User-Agent'].startswith('nda-tools/'))
+        self.assertIn('gzip', get_session().headers['Accept-Encoding'])
+
+    def test_requests_do_not_share_cookies_or_use_netrc(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            netrc_file = os.path.join(tmp_dir, 'netrc')
+            with open(netrc_file, 'w') as f:
+                f.write('machine nda.nih.gov login user password pass\n')
+            get_session().cookies.set('session-cookie', 'value')
+            try:
+                with patch('NDATools.Utils._send_prepared_request') as mock_send, \
+                        patch.dict(os.environ, {'NETRC': netrc_file}):
+                    get_request('https://nda.nih.gov/api/validation')
+                prepped = mock_send.call_args[0][0]
+            finally:
+                get_session().cookies.clear()
+        self.assertNotIn('Cookie', prepped.headers)
+        self.assertNotIn('Authorization', prepped.headers)
+        self.assertTrue(prepped.headers['User-Agent'].startswith('nda-tools/'))
+        # cookies sent by the server are rejected instead of being stored in the shared session
+        response = mock.MagicMock()
+        response._original_response.msg = http.client.HTTPMessage()
+        response._original_response.msg['Set-Cookie'] = 'session-cookie=value'
+        requests.cookies.extract_cookies_to_jar(get_session().cookies, prepped, response)
+        self.assertEqual(len(get_session().cookies), 0)
+
+    def test_get_data_and_header_params_does_not_modify_headers(self):
+        headers = {}
+        data_param, new_headers = get_data_and_header_params('{"id": 1}', headers)
+        self.assertEqual(data_param, {'data': '{"id": 1}'})
+        self.assertEqual(new_headers['content-type'], 'application/json')
+        self.assertEqual(headers, {})
+
+    def test_remove_file_if_exists(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'file.partial')
+            open(test_file, 'w').close()
+            remove_file_if_exists(test_file)
+            self.assertFalse(os.path.exists(test_file))
+            # removing a file that doesn't exist is not an error
+            remove_file_if_exists(test_file)
+
+    def test_cached_http_basic_auth(self):
+        for username, password in [('user', 'pass'), ('user', 'p\u00e4ss:w\u00f6rd'), (b'user', b'pass')]:
+            auth = CachedHTTPBasicAuth(username, password)
+            request = requests.Request('GET', 'https://nda.nih.gov', auth=auth).prepare()
+            expected = requests.Request('GET', 'https://nda.nih.gov',
+                                        auth=requests.auth.HTTPBasicAuth(username, password)).prepare()
+            self.assertEqual(request.headers['Authorization'], expected.headers['Authorization'])
+
+    def test_convert_json(self):
+        response = requests.Response()
+        response._content = '{"results": [{"name": "caf\u00e9"}]}'.encode('utf-8')
+        self.assertEqual(DeserializeHandler.convert_json(response), {'results': [{'name': 'caf\u00e9'}]})
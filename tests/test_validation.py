@@ -68,3 +68,35 @@ class TestValidation:
             assert result['status'] == 'Complete'
             assert result['expiration_date'] == '07/14/2021'
             assert result['errors'] == {}
+
+    def test_validation_with_pending_changes(self, monkeypatch,
+                                             validation_config_factory,
+                                             shared_datadir):
+
+        file_path = (shared_datadir / 'validation/file.csv')
+        args, config = validation_config_factory([str(file_path)])
+        config.JSON = True
+
+        pending_changes = [{'shortName': 'fakestructure01', 'rows': 10, 'associatedFiles': [], 'manifests': [],
+                            'validationUuids': ['original-fakestructure01']},
+                           {'shortName': 'otherstructure01', 'rows': 2, 'associatedFiles': [], 'manifests': [],
+                            'validationUuids': ['original-otherstructure01']}]
+        original_uuids = {'original-fakestructure01', 'original-otherstructure01'}
+
+        def mocked_post_request(*args, **kwargs):
+            return json.loads(self._load_from_file('validation/api_response/initiate_validation.json'))
+
+        def mocked_get_request(*args, **kwargs):
+            return json.loads(next(self._get_responses))
+
+        with monkeypatch.context() as m:
+            m.setattr(Validation, 'post_request', mocked_post_request)
+            m.setattr(Validation, 'get_request', mocked_get_request)
+            validation = Validation.Validation(args.files, config=config, hide_progress=config.hideProgress, thread_num=1,
+                                               allow_exit=True, pending_changes=pending_changes,
+                                               original_uuids=original_uuids)
+            validation.validate()
+
+            assert validation.associated_files_to_upload == set()
+            assert validation.data_structures_with_missing_rows == [('fakestructure01', 10, 4)]
+            assert set(validation.uuid) == {'test', 'original-otherstructure01'}